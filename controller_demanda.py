@@ -2,13 +2,28 @@ from PySide6.QtWidgets import QMessageBox
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from matplotlib.figure import Figure
 import numpy as np
+import os
 
 from model_demanda import DemandModel
+from preprocesamiento_demanda import Preprocessor
 from view_demanda import MainWindow
+from sesion_demanda import default_session_path, load_session, save_session
 
 
 class DemandController:
     """Controlador para la aplicación de análisis de demanda"""
+    
+    # Opciones del combo de preprocesamiento
+    PREPROCESSORS = {
+        "Sin preprocesamiento": lambda: None,
+        "Descartar outliers (MAD)": lambda: Preprocessor('mad'),
+        "Descartar outliers (IQR)": lambda: Preprocessor('iqr'),
+        "Winsorizar (MAD)": lambda: Preprocessor('mad', action='winsorize'),
+        "MAD + pesos volumen/recencia": lambda: Preprocessor(
+            'mad', volume_weights=True, recency_half_life=10
+        )
+    }
+    
     def __init__(self):
         self.model = DemandModel()
         self.view = MainWindow()
@@ -18,24 +33,67 @@ class DemandController:
         self.figure.patch.set_facecolor('#1a1a1a')
         self.canvas = FigureCanvasQTAgg(self.figure)
         
+        # Gráfico actual, para poder redibujarlo al restaurar la sesión
+        self.current_plot = "empty"
+        self.session_path = default_session_path()
+        
         self._setup_connections()
         self._initialize_view()
     
     def _setup_connections(self):
         """Conecta las señales de la vista con los métodos del controlador"""
         self.view.load_api_btn.clicked.connect(self._on_load_api)
+        self.view.cross_elasticity_btn.clicked.connect(self._on_cross_elasticity)
         self.view.apply_manual_btn.clicked.connect(self._on_apply_manual)
         self.view.calculate_btn.clicked.connect(self._on_calculate_regression)
         
         self.view.viz_both.toggled.connect(self._on_visualization_changed)
         self.view.viz_linear.toggled.connect(self._on_visualization_changed)
         self.view.viz_log.toggled.connect(self._on_visualization_changed)
+        self.view.preprocess_combo.currentIndexChanged.connect(self._on_preprocessing_changed)
+        
+        self.view.closing.connect(self._on_closing)
     
     def _initialize_view(self):
         """Inicializa la vista con datos del modelo"""
         self.view.graph_layout.addWidget(self.canvas)
+        # Las etiquetas del selector son las claves de PREPROCESSORS
+        self.view.set_preprocessing_options(self.PREPROCESSORS)
         
         self._plot_empty()
+        self._restore_session()
+    
+    def _restore_session(self):
+        """Restaura la sesión anterior si existe"""
+        if not os.path.exists(self.session_path):
+            return
+        
+        try:
+            view_state = load_session(self.session_path, self.model)
+        except Exception as e:
+            self.model = DemandModel()
+            self._show_error(f"No se pudo restaurar la sesión anterior: {str(e)}")
+            return
+        
+        self.view.restore_session_state(view_state)
+        
+        plot = view_state.get('plot', 'empty')
+        if plot == "regression" and self.model.linear_slope is not None:
+            self._plot_regression()
+        elif plot == "cross_elasticity" and self.model.cross_elasticity is not None:
+            self._plot_cross_elasticity()
+        elif plot in ("data", "regression") and len(self.model.prices) > 0:
+            self._plot_data()
+    
+    def _on_closing(self):
+        """Guarda la sesión al cerrar la ventana"""
+        view_state = self.view.get_session_state()
+        view_state['plot'] = self.current_plot
+        try:
+            save_session(self.session_path, self.model, view_state)
+        except Exception as e:
+            # Avisar pero no bloquear el cierre si no se puede escribir la sesión
+            self._show_error(f"No se pudo guardar la sesión: {str(e)}")
     
     def _on_load_api(self):
         """Maneja el evento de cargar datos desde API"""
@@ -48,6 +106,25 @@ class DemandController:
         except Exception as e:
             self._show_error(f"Error al cargar datos: {str(e)}")
     
+    def _on_cross_elasticity(self):
+        """Maneja el evento de calcular elasticidades cruzadas de todas las acciones"""
+        try:
+            symbols = self.model.fetch_panel_data(list(self.model.STOCK_SYMBOLS), days=365)
+            self.model.calculate_multivariate_regression()
+            self._plot_cross_elasticity()
+            message = (
+                f"Elasticidades calculadas para {len(symbols)} acciones "
+                f"({len(self.model.panel_timestamps)} días comunes)"
+            )
+            if self.model.multi_dropped_rows:
+                message += (
+                    f"\nSe descartaron {self.model.multi_dropped_rows} días "
+                    f"con precio o volumen no positivo"
+                )
+            self._show_info(message)
+        except Exception as e:
+            self._show_error(f"Error al calcular elasticidades cruzadas: {str(e)}")
+    
     def _on_apply_manual(self):
         """Maneja el evento de aplicar datos manuales"""
         prices_text = self.view.prices_input.text().strip()
@@ -84,6 +161,9 @@ class DemandController:
             return
         
         try:
+            preprocessor = self.PREPROCESSORS[self.view.preprocess_combo.currentText()]()
+            self.model.set_preprocessor(preprocessor)
+            
             # Calcular regresiones
             slope, intercept, r2_linear, p_value = self.model.calculate_linear_regression()
             a, b, r2_log, elasticity = self.model.calculate_log_regression()
@@ -94,14 +174,21 @@ class DemandController:
         except Exception as e:
             self._show_error(f"Error al calcular regresión: {str(e)}")
     
+    def _on_preprocessing_changed(self):
+        """Recalcula la regresión si cambia el preprocesamiento y se está mostrando"""
+        # Con otro gráfico en pantalla la opción se aplica al próximo cálculo
+        if self.current_plot == "regression" and self.model.linear_slope is not None:
+            self._on_calculate_regression()
+    
     def _on_visualization_changed(self):
         """Maneja el cambio en las opciones de visualización"""
-        # Solo redibujar si ya se calculó la regresión
-        if self.model.linear_slope is not None:
+        # Solo redibujar si se está mostrando la regresión (no el mapa de calor)
+        if self.current_plot == "regression" and self.model.linear_slope is not None:
             self._plot_regression()
     
     def _plot_empty(self):
         """Dibuja un gráfico vacío"""
+        self.current_plot = "empty"
         self.figure.clear()
         ax = self.figure.add_subplot(111)
         
@@ -122,6 +209,7 @@ class DemandController:
     
     def _plot_data(self):
         """Dibuja solo los datos sin regresión"""
+        self.current_plot = "data"
         self.figure.clear()
         ax = self.figure.add_subplot(111)
         
@@ -148,6 +236,7 @@ class DemandController:
     
     def _plot_regression(self):
         """Dibuja los datos con las líneas de regresión según el modo seleccionado"""
+        self.current_plot = "regression"
         self.figure.clear()
         ax = self.figure.add_subplot(111)
         
@@ -160,10 +249,7 @@ class DemandController:
         ax.xaxis.label.set_color('#cccccc')
         ax.yaxis.label.set_color('#cccccc')
         
-        # Datos originales
-        ax.scatter(self.model.prices, self.model.quantities, 
-                  color='#9966CC', s=100, alpha=0.8, 
-                  label='Datos observados', zorder=3)
+        self._scatter_weighted_data(ax)
         
         # Generar puntos para las líneas de regresión
         price_range = np.linspace(self.model.prices.min(), 
@@ -194,6 +280,76 @@ class DemandController:
         
         self.canvas.draw()
     
+    def _scatter_weighted_data(self, ax):
+        """Dibuja los datos distinguiendo los puntos descartados o con menor peso"""
+        prices, quantities = self.model.prices, self.model.quantities
+        weights = self.model.weights
+        
+        if weights is None:
+            ax.scatter(prices, quantities, 
+                      color='#9966CC', s=100, alpha=0.8, 
+                      label='Datos observados', zorder=3)
+            return
+        
+        outliers = self.model.outliers
+        rejected = weights == 0
+        full = (weights >= 0.999) & ~outliers
+        reduced = ~full & ~rejected
+        
+        ax.scatter(prices[full], quantities[full], 
+                  color='#9966CC', s=100, alpha=0.8, 
+                  label='Datos observados', zorder=3)
+        
+        if np.any(reduced):
+            # Tamaño proporcional al peso usado en el ajuste
+            ax.scatter(prices[reduced], quantities[reduced], 
+                      facecolors='none', edgecolors='#C8B3E0', 
+                      s=30 + 70 * weights[reduced], linewidths=1.5, 
+                      label='Peso reducido / winsorizados', zorder=3)
+        
+        if np.any(rejected):
+            ax.scatter(prices[rejected], quantities[rejected], 
+                      color='#FFB74D', marker='x', s=80, 
+                      label='Outliers descartados', zorder=3)
+    
+    def _plot_cross_elasticity(self):
+        """Dibuja la matriz de elasticidades precio propias y cruzadas como mapa de calor"""
+        self.current_plot = "cross_elasticity"
+        self.figure.clear()
+        ax = self.figure.add_subplot(111)
+        
+        ax.set_facecolor('#1a1a1a')
+        ax.tick_params(colors='#cccccc')
+        ax.xaxis.label.set_color('#cccccc')
+        ax.yaxis.label.set_color('#cccccc')
+        
+        matrix = self.model.cross_elasticity
+        symbols = self.model.panel_symbols
+        # Escala simétrica centrada en 0 para distinguir sustitutos de complementarios
+        limit = np.nanmax(np.abs(matrix)) or 1.0
+        image = ax.imshow(matrix, cmap='PuOr_r', vmin=-limit, vmax=limit)
+        
+        ax.set_xticks(range(len(symbols)))
+        ax.set_yticks(range(len(symbols)))
+        ax.set_xticklabels(symbols, rotation=45, ha='right')
+        ax.set_yticklabels(symbols)
+        
+        # Anotar valores solo si la matriz es legible
+        if len(symbols) <= 12:
+            for i in range(len(symbols)):
+                for j in range(len(symbols)):
+                    ax.text(j, i, f"{matrix[i, j]:.2f}", ha='center', va='center',
+                            color='#ffffff', fontsize=8)
+        
+        colorbar = self.figure.colorbar(image, ax=ax)
+        colorbar.ax.tick_params(colors='#cccccc')
+        
+        ax.set_xlabel('Precio de la acción j', fontsize=12, fontweight='bold')
+        ax.set_ylabel('Volumen de la acción i', fontsize=12, fontweight='bold')
+        
+        self.figure.tight_layout()
+        self.canvas.draw()
+    
     def _show_info(self, message: str):
         """Muestra un mensaje informativo"""
         msg = QMessageBox(self.view)
@@ -0,0 +1,370 @@
+import csv
+import json
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+import requests
+
+
+Series = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+class DataSource(ABC):
+    """Interfaz común para los proveedores de series de precio y volumen"""
+
+    @abstractmethod
+    def fetch_series(self, symbol: str, days: int = 30) -> Series:
+        """
+        Obtiene la serie completa de un símbolo
+        Args:
+            symbol: Ticker de la acción ('AAPL', 'MSFT', etc.)
+            days: Cantidad de días hacia atrás a consultar
+        Returns: (timestamps, close_prices, volumes) ordenados por timestamp
+        """
+
+
+def parse_yahoo_chart(data: dict) -> Series:
+    """Extrae timestamps, cierres y volúmenes de una respuesta de Yahoo Finance"""
+    result = data['chart']['result'][0]
+    quotes = result['indicators']['quote'][0]
+
+    # None -> nan para poder filtrar de forma vectorizada
+    timestamps = np.asarray(result.get('timestamp') or [], dtype=np.int64)
+    close_prices = np.array(quotes['close'], dtype=float)
+    volumes = np.array(quotes['volume'], dtype=float)
+
+    valid = ~(np.isnan(close_prices) | np.isnan(volumes))
+    if len(timestamps) != len(valid):
+        timestamps = np.arange(len(valid), dtype=np.int64)
+
+    return timestamps[valid], close_prices[valid], volumes[valid]
+
+
+class TokenBucket:
+    """Limitador de tasa: permite ráfagas de hasta `capacity` pedidos a `rate` pedidos/s"""
+
+    def __init__(self, rate: float = 2.0, capacity: int = 5,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        # Durante una pausa `_last` queda en el futuro y no se acumulan tokens
+        if now > self._last:
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+
+    def acquire(self):
+        """Bloquea hasta que haya un token disponible y lo consume"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                paused = max(0.0, self._last - self._clock())
+                wait = paused + (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+    def pause(self, seconds: float):
+        """Vacía el balde y no entrega tokens durante `seconds` (p. ej. tras un 429)"""
+        with self._lock:
+            self._refill()
+            self._tokens = 0.0
+            self._last = max(self._last, self._clock() + seconds)
+
+
+class CircuitBreaker:
+    """
+    Corta los pedidos tras `failure_threshold` fallos consecutivos y
+    permite un pedido de prueba pasados `reset_timeout` segundos
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = 0.0
+        self.state = self.CLOSED
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Indica si se puede intentar un pedido (en half-open, solo uno a la vez)"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            self.state = self.CLOSED
+
+    def release(self):
+        """Libera el pedido de prueba sin registrar un resultado"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = self._clock()
+
+
+class YahooFinanceSource(DataSource):
+    """Proveedor de Yahoo Finance con limitación de tasa, reintentos y circuit breaker"""
+
+    URL = "https://query1.finance.yahoo.com/v8/finance/chart/{symbol}"
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    }
+    # Códigos HTTP transitorios que vale la pena reintentar
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, max_retries: int = 4, base_delay: float = 0.5,
+                 max_delay: float = 8.0, max_retry_after: float = 120.0,
+                 timeout: Tuple[float, float] = (5.0, 10.0),
+                 rate_limiter: Optional[TokenBucket] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 session: Optional[requests.Session] = None,
+                 record_dir: Optional[str] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            max_delay: Tope del retardo exponencial entre reintentos
+            max_retry_after: Si el servicio pide esperar (Retry-After) más que
+                             esto, se abandona en vez de reintentar
+            record_dir: Si se indica, guarda cada respuesta cruda como
+                        `<record_dir>/<symbol>.json` para reproducirla con FixtureSource
+            session: Sesión HTTP a reutilizar (permite inyectar una sesión falsa
+                     para medir el pipeline sin red)
+            clock, sleep: Reloj y espera usados por el limitador, el circuit breaker
+                          y los reintentos; un par falso simula el paso del tiempo
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or TokenBucket(clock=clock, sleep=sleep)
+        self.circuit_breaker = circuit_breaker or CircuitBreaker(clock=clock)
+        self.session = session or requests.Session()
+        self.session.headers.update(self.HEADERS)
+        self.record_dir = record_dir
+        self._sleep = sleep
+
+    def _backoff(self, attempt: int) -> float:
+        """Retardo exponencial con jitter completo"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _retry_after(self, value: Optional[str]) -> Optional[float]:
+        """Segundos indicados por Retry-After (en segundos o como fecha HTTP)"""
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+    def _request(self, symbol: str, params: dict) -> dict:
+        last_error: Optional[Exception] = None
+
+        for attempt in range(self.max_retries + 1):
+            if not self.circuit_breaker.allow_request():
+                raise ValueError("Servicio no disponible temporalmente (circuit breaker abierto)")
+
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.get(self.URL.format(symbol=symbol),
+                                            params=params, timeout=self.timeout)
+                if response.status_code in self.RETRY_STATUS:
+                    raise requests.HTTPError(
+                        f"HTTP {response.status_code}", response=response
+                    )
+                response.raise_for_status()
+                data = response.json()
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+                delay = self._backoff(attempt)
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code not in self.RETRY_STATUS:
+                    # Error del cliente: el servicio respondió, pero reintentar
+                    # no lo va a resolver
+                    if e.response is not None:
+                        self.circuit_breaker.record_success()
+                    else:
+                        self.circuit_breaker.release()
+                    raise
+                last_error = e
+                retry_after = self._retry_after(e.response.headers.get('Retry-After'))
+                delay = self._backoff(attempt) if retry_after is None else retry_after
+                if delay > self.max_retry_after:
+                    self.circuit_breaker.release()
+                    raise ValueError(
+                        f"El servicio pide esperar {delay:.0f} s "
+                        f"(máximo {self.max_retry_after:.0f} s)"
+                    )
+                if e.response.status_code == 429:
+                    # Limitación de tasa: el servicio está sano, así que no cuenta
+                    # para el circuit breaker; se pausan todos los pedidos
+                    self.circuit_breaker.release()
+                    if attempt < self.max_retries:
+                        self.rate_limiter.pause(delay)
+                    continue
+            except Exception:
+                # Respuesta inesperada (p. ej. JSON inválido): no dejar el
+                # pedido de prueba tomado
+                self.circuit_breaker.release()
+                raise
+            else:
+                self.circuit_breaker.record_success()
+                return data
+
+            # Solo 5xx, timeouts y errores de conexión cuentan como fallos
+            self.circuit_breaker.record_failure()
+            if attempt < self.max_retries:
+                self._sleep(delay)
+
+        raise ValueError(f"Sin respuesta tras {self.max_retries + 1} intentos: {last_error}")
+
+    def fetch_series(self, symbol: str, days: int = 30) -> Series:
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days)
+        params = {
+            'period1': int(start_date.timestamp()),
+            'period2': int(end_date.timestamp()),
+            'interval': '1d'
+        }
+
+        data = self._request(symbol, params)
+
+        if self.record_dir:
+            os.makedirs(self.record_dir, exist_ok=True)
+            with open(os.path.join(self.record_dir, f"{symbol}.json"), 'w') as f:
+                json.dump(data, f)
+
+        return parse_yahoo_chart(data)
+
+
+class FixtureSource(DataSource):
+    """Reproduce respuestas de Yahoo Finance grabadas en `<directory>/<symbol>.json`"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._cache = {}
+
+    def fetch_series(self, symbol: str, days: int = 30) -> Series:
+        if symbol not in self._cache:
+            path = os.path.join(self.directory, f"{symbol}.json")
+            if not os.path.exists(path):
+                raise ValueError(f"No hay respuesta grabada para {symbol} en {self.directory}")
+            with open(path) as f:
+                self._cache[symbol] = parse_yahoo_chart(json.load(f))
+        return self._cache[symbol]
+
+
+class CSVDirectorySource(DataSource):
+    """
+    Lee series desde `<directory>/<symbol>.csv` con encabezado.
+    Columnas reconocidas: date/timestamp/fecha, close/precio, volume/volumen
+    """
+
+    DATE_COLUMNS = ('timestamp', 'date', 'fecha')
+    CLOSE_COLUMNS = ('close', 'adj close', 'precio')
+    VOLUME_COLUMNS = ('volume', 'volumen')
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    @staticmethod
+    def _find_column(header, names) -> Optional[int]:
+        lowered = [h.strip().lower() for h in header]
+        for name in names:
+            if name in lowered:
+                return lowered.index(name)
+        return None
+
+    @staticmethod
+    def _parse_date(value: str) -> int:
+        value = value.strip()
+        try:
+            return int(float(value))
+        except ValueError:
+            return int(datetime.fromisoformat(value).timestamp())
+
+    def fetch_series(self, symbol: str, days: int = 30) -> Series:
+        path = os.path.join(self.directory, f"{symbol}.csv")
+        if not os.path.exists(path):
+            raise ValueError(f"No existe el archivo {path}")
+
+        with open(path, newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            rows = [row for row in reader if row]
+
+        date_col = self._find_column(header, self.DATE_COLUMNS)
+        close_col = self._find_column(header, self.CLOSE_COLUMNS)
+        volume_col = self._find_column(header, self.VOLUME_COLUMNS)
+        if close_col is None or volume_col is None:
+            raise ValueError(f"{path} debe tener columnas de cierre y volumen")
+
+        def to_float(value: str) -> float:
+            try:
+                return float(value)
+            except ValueError:
+                return np.nan
+
+        close_prices = np.array([to_float(r[close_col]) for r in rows])
+        volumes = np.array([to_float(r[volume_col]) for r in rows])
+        if date_col is not None:
+            timestamps = np.array([self._parse_date(r[date_col]) for r in rows], dtype=np.int64)
+        else:
+            timestamps = np.arange(len(rows), dtype=np.int64)
+
+        order = np.argsort(timestamps, kind='stable')
+        timestamps, close_prices, volumes = timestamps[order], close_prices[order], volumes[order]
+
+        valid = ~(np.isnan(close_prices) | np.isnan(volumes))
+        if date_col is not None and len(timestamps):
+            valid &= timestamps >= timestamps[-1] - days * 86400
+
+        return timestamps[valid], close_prices[valid], volumes[valid]
@@ -1,8 +1,10 @@
 import numpy as np
 from scipy import stats
-from typing import Tuple, Optional
-import requests
-from datetime import datetime, timedelta
+from typing import Tuple, Optional, Dict, List, Sequence
+from concurrent.futures import ThreadPoolExecutor
+
+from fuentes_demanda import DataSource, YahooFinanceSource
+from preprocesamiento_demanda import Preprocessor
 
 
 class DemandModel:
@@ -19,10 +21,21 @@ class DemandModel:
         'NVIDIA': 'NVDA'
     }
     
-    def __init__(self):
+    def __init__(self, data_source: Optional[DataSource] = None):
+        # Proveedor de datos (Yahoo por defecto; FixtureSource/CSVDirectorySource para uso offline)
+        self.data_source = data_source or YahooFinanceSource()
+        
         self.prices = np.array([])
         self.quantities = np.array([])
         
+        # Preprocesamiento previo a las regresiones (None = datos crudos)
+        self.preprocessor: Optional[Preprocessor] = None
+        self.weights: Optional[np.ndarray] = None
+        self.outliers: Optional[np.ndarray] = None
+        
+        # Últimas series obtenidas por símbolo: {symbol: (timestamps, prices, volumes)}
+        self.series_cache: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        
         # Resultados de regresión
         self.linear_slope: Optional[float] = None
         self.linear_intercept: Optional[float] = None
@@ -33,6 +46,19 @@ class DemandModel:
         self.log_b: Optional[float] = None
         self.log_r_squared: Optional[float] = None
         self.log_elasticity: Optional[float] = None
+        
+        # Panel multivariado (varios símbolos alineados por fecha)
+        self.panel_symbols: List[str] = []
+        self.panel_timestamps = np.array([], dtype=np.int64)
+        self.panel_prices = np.empty((0, 0))
+        self.panel_quantities = np.empty((0, 0))
+        
+        # Resultados de regresión multivariada
+        self.cross_elasticity: Optional[np.ndarray] = None
+        self.multi_intercepts: Optional[np.ndarray] = None
+        self.multi_coefficients: Optional[np.ndarray] = None
+        self.multi_r_squared: Optional[np.ndarray] = None
+        self.multi_dropped_rows = 0
     
     def update_data(self, prices: np.ndarray, quantities: np.ndarray):
         """Actualiza los datos de precio y cantidad"""
@@ -50,6 +76,77 @@ class DemandModel:
         self.log_b = None
         self.log_r_squared = None
         self.log_elasticity = None
+        self.weights = None
+        self.outliers = None
+    
+    def _reset_panel_results(self):
+        """Resetea los resultados de la regresión multivariada"""
+        self.cross_elasticity = None
+        self.multi_intercepts = None
+        self.multi_coefficients = None
+        self.multi_r_squared = None
+        self.multi_dropped_rows = 0
+    
+    def set_preprocessor(self, preprocessor: Optional[Preprocessor]):
+        """Configura la etapa de preprocesamiento e invalida los resultados"""
+        self.preprocessor = preprocessor
+        self._reset_results()
+    
+    def preprocess(self) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """
+        Aplica el preprocesamiento configurado a los datos cargados
+        Returns: (prices, quantities, weights) listos para ajustar; weights es
+                 None si no hay preprocesamiento (mínimos cuadrados ordinarios)
+        """
+        if self.preprocessor is None:
+            self.weights = None
+            self.outliers = None
+            return self.prices, self.quantities, None
+        
+        prices, quantities, self.weights, self.outliers = self.preprocessor.apply(
+            self.prices, self.quantities
+        )
+        return prices, quantities, self.weights
+    
+    @staticmethod
+    def _weighted_linregress(x: np.ndarray, y: np.ndarray,
+                             weights: np.ndarray) -> Tuple[float, float, float, float]:
+        """
+        Regresión lineal por mínimos cuadrados ponderados
+        Returns: (slope, intercept, r_value, p_value) como stats.linregress
+        """
+        mask = weights > 0
+        x, y, w = x[mask], y[mask], weights[mask]
+        n = len(x)
+        
+        x_mean = np.average(x, weights=w)
+        y_mean = np.average(y, weights=w)
+        sxx = np.sum(w * (x - x_mean) ** 2)
+        syy = np.sum(w * (y - y_mean) ** 2)
+        sxy = np.sum(w * (x - x_mean) * (y - y_mean))
+        if sxx == 0:
+            raise ValueError("Los precios ponderados no varían")
+        
+        slope = sxy / sxx
+        intercept = y_mean - slope * x_mean
+        r_value = sxy / np.sqrt(sxx * syy) if syy > 0 else 0.0
+        
+        # Test t de la pendiente con n - 2 grados de libertad
+        if n > 2 and abs(r_value) < 1:
+            std_err = np.sqrt((1 - r_value ** 2) * syy / sxx / (n - 2))
+            p_value = 2 * stats.t.sf(abs(slope / std_err), n - 2)
+        else:
+            p_value = 0.0 if n > 2 else np.nan
+        
+        return slope, intercept, r_value, p_value
+    
+    def _fit(self, x: np.ndarray, y: np.ndarray,
+             weights: Optional[np.ndarray]) -> Tuple[float, float, float, float]:
+        """Ajusta y = intercept + slope*x, ponderado si hay pesos"""
+        if weights is None:
+            slope, intercept, r_value, p_value, std_err = stats.linregress(x, y)
+            return slope, intercept, r_value, p_value
+        return self._weighted_linregress(x, y, weights)
     
     def calculate_linear_regression(self) -> Tuple[float, float, float, float]:
         """
@@ -59,9 +156,11 @@ class DemandModel:
         if len(self.prices) < 2 or len(self.quantities) < 2:
             raise ValueError("Se necesitan al menos 2 puntos de datos")
         
-        slope, intercept, r_value, p_value, std_err = stats.linregress(
-            self.prices, self.quantities
-        )
+        prices, quantities, weights = self.preprocess()
+        if weights is not None and np.count_nonzero(weights) < 2:
+            raise ValueError("Quedan menos de 2 puntos tras filtrar outliers")
+        
+        slope, intercept, r_value, p_value = self._fit(prices, quantities, weights)
         
         self.linear_slope = slope
         self.linear_intercept = intercept
@@ -78,17 +177,23 @@ class DemandModel:
         if len(self.prices) < 2 or len(self.quantities) < 2:
             raise ValueError("Se necesitan al menos 2 puntos de datos")
         
-        if np.any(self.prices <= 0) or np.any(self.quantities <= 0):
+        prices, quantities, weights = self.preprocess()
+        if weights is not None:
+            # Los puntos descartados no participan del ajuste
+            used = weights > 0
+            if np.count_nonzero(used) < 2:
+                raise ValueError("Quedan menos de 2 puntos tras filtrar outliers")
+            prices, quantities, weights = prices[used], quantities[used], weights[used]
+        
+        if np.any(prices <= 0) or np.any(quantities <= 0):
             raise ValueError("Los valores deben ser positivos para regresión logarítmica")
         
         # Transformación logarítmica
-        log_prices = np.log(self.prices)
-        log_quantities = np.log(self.quantities)
+        log_prices = np.log(prices)
+        log_quantities = np.log(quantities)
         
         # Regresión lineal en escala logarítmica
-        b, log_a, r_value, p_value, std_err = stats.linregress(
-            log_prices, log_quantities
-        )
+        b, log_a, r_value, p_value = self._fit(log_prices, log_quantities, weights)
         
         a = np.exp(log_a)
         
@@ -131,7 +236,7 @@ class DemandModel:
     
     def fetch_api_data(self, source: str) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Obtiene datos de una API externa (Yahoo Finance)
+        Obtiene datos del proveedor configurado (Yahoo Finance por defecto)
         Args:
             source: Fuente de datos ('Apple', 'Microsoft', etc.)
         Returns: (prices, quantities)
@@ -142,49 +247,182 @@ class DemandModel:
         symbol = self.STOCK_SYMBOLS[source]
         
         try:
-            # Usar Yahoo Finance API (sin necesidad de API key)
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=30)
-            
-            # Formato de fechas para Yahoo Finance
-            period1 = int(start_date.timestamp())
-            period2 = int(end_date.timestamp())
-            
-            url = f"https://query1.finance.yahoo.com/v8/finance/chart/{symbol}"
-            params = {
-                'period1': period1,
-                'period2': period2,
-                'interval': '1d'
-            }
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            
-            response = requests.get(url, params=params, headers=headers, timeout=10)
-            response.raise_for_status()
+            timestamps, close_prices, volumes = self.data_source.fetch_series(symbol, days=30)
+            self.series_cache[symbol] = (timestamps, close_prices, volumes)
             
-            data = response.json()
-            result = data['chart']['result'][0]
+            # Tomar últimos 15 días
+            close_prices = close_prices[-15:]
+            volumes = volumes[-15:]
             
-            # Extraer precios de cierre y volúmenes
-            quotes = result['indicators']['quote'][0]
-            close_prices = quotes['close']
-            volumes = quotes['volume']
-            
-            # Filtrar valores None y tomar últimos 15 días
-            valid_data = [(p, v) for p, v in zip(close_prices, volumes) 
-                         if p is not None and v is not None]
-            valid_data = valid_data[-15:]  # Últimos 15 días
-            
-            if len(valid_data) < 5:
+            if len(close_prices) < 5:
                 raise ValueError("No hay suficientes datos válidos")
             
-            prices = np.array([d[0] for d in valid_data])
+            prices = np.asarray(close_prices, dtype=float)
             # Normalizar volúmenes a escala más manejable (en miles)
-            quantities = np.array([d[1] / 1000 for d in valid_data])
+            quantities = np.asarray(volumes, dtype=float) / 1000
             
             return prices, quantities
             
         except Exception as e:
             raise ValueError(f"Error al obtener datos de {source}: {str(e)}")
+    
+    @staticmethod
+    def align_series(series: Sequence[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+                     resolution: int = 86400) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Alinea varias series (timestamps, precios, volúmenes) por fecha común:
+        ordena cada serie por timestamp e intersecta las claves (inner join)
+        Args:
+            series: Lista de tuplas (timestamps, prices, volumes) por símbolo
+            resolution: Los timestamps se truncan a este paso en segundos (1 día por defecto).
+                        Series con índices posicionales en vez de fechas se rechazan
+        Returns: (timestamps, prices, volumes) con prices/volumes de forma (T, N)
+        """
+        if len(series) == 0:
+            raise ValueError("No hay series para alinear")
+        
+        keys = []
+        for timestamps, _, _ in series:
+            timestamps = np.asarray(timestamps, dtype=np.int64)
+            # Las fuentes sin fecha devuelven índices posicionales (0, 1, 2, ...),
+            # que al truncarlos caerían todos en la misma clave
+            if len(timestamps) > 1 and timestamps.max() < resolution:
+                raise ValueError(
+                    "Hay series sin fechas reales (índices posicionales); "
+                    "no se pueden alinear por fecha"
+                )
+            key = timestamps // resolution
+            order = np.argsort(key, kind='stable')
+            key = key[order]
+            # Para fechas repetidas se conserva la última observación
+            last = np.r_[key[1:] != key[:-1], len(key) > 0][:len(key)]
+            keys.append((key[last], order[last]))
+        
+        common = keys[0][0]
+        for key, _ in keys[1:]:
+            common = np.intersect1d(common, key, assume_unique=True)
+        
+        n_obs, n_series = len(common), len(series)
+        prices = np.empty((n_obs, n_series))
+        volumes = np.empty((n_obs, n_series))
+        for j, ((key, positions), (_, p, v)) in enumerate(zip(keys, series)):
+            idx = positions[np.searchsorted(key, common)]
+            prices[:, j] = np.asarray(p, dtype=float)[idx]
+            volumes[:, j] = np.asarray(v, dtype=float)[idx]
+        
+        return common * resolution, prices, volumes
+    
+    def fetch_panel_data(self, sources: Sequence[str], days: int = 365) -> List[str]:
+        """
+        Obtiene y alinea por fecha las series de varios símbolos
+        Args:
+            sources: Nombres ('Apple', ...) o tickers ('AAPL', ...)
+            days: Cantidad de días hacia atrás a consultar
+        Returns: Lista de tickers del panel
+        """
+        symbols = list(dict.fromkeys(self.STOCK_SYMBOLS.get(s, s) for s in sources))
+        if len(symbols) < 2:
+            raise ValueError("Se necesitan al menos 2 símbolos para el panel")
+        
+        def fetch(symbol):
+            try:
+                series = self.data_source.fetch_series(symbol, days=days)
+            except Exception as e:
+                raise ValueError(f"Error al obtener datos de {symbol}: {str(e)}")
+            self.series_cache[symbol] = series
+            return series
+        
+        # El proveedor limita la tasa de pedidos, los hilos solo solapan la latencia
+        with ThreadPoolExecutor(max_workers=min(8, len(symbols))) as executor:
+            series = list(executor.map(fetch, symbols))
+        
+        timestamps, prices, volumes = self.align_series(series)
+        self.update_panel_data(symbols, timestamps, prices, volumes / 1000)
+        return symbols
+    
+    def update_panel_data(self, symbols: Sequence[str], timestamps: np.ndarray,
+                          prices: np.ndarray, quantities: np.ndarray):
+        """Actualiza el panel multivariado con datos ya alineados (T, N)"""
+        prices = np.asarray(prices, dtype=float)
+        quantities = np.asarray(quantities, dtype=float)
+        if (prices.ndim != 2 or prices.shape != quantities.shape
+                or prices.shape[1] != len(symbols)):
+            raise ValueError("Las dimensiones del panel no coinciden con los símbolos")
+        
+        self.panel_symbols = list(symbols)
+        self.panel_timestamps = np.asarray(timestamps, dtype=np.int64).copy()
+        self.panel_prices = prices.copy()
+        self.panel_quantities = quantities.copy()
+        self._reset_panel_results()
+    
+    def calculate_multivariate_regression(
+        self, regressors: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Calcula la demanda log-log de cada símbolo i del panel:
+        ln Q_i = a_i + sum_j e_ij * ln P_j + sum_k g_ik * X_k
+        Todas las ecuaciones comparten la matriz de diseño, por lo que se
+        resuelven con una sola llamada a lstsq. Las fechas con algún precio o
+        volumen no positivo o con regresores no finitos se descartan
+        (ver multi_dropped_rows)
+        Args:
+            regressors: Regresores adicionales alineados con el panel, forma (T, K)
+        Returns: (cross_elasticity, r_squared) con cross_elasticity[i, j] = e_ij
+        """
+        n_obs, n_symbols = self.panel_prices.shape
+        if n_symbols < 2:
+            raise ValueError("Debe cargar un panel de al menos 2 símbolos")
+        
+        if regressors is not None:
+            regressors = np.asarray(regressors, dtype=float)
+            if regressors.ndim == 1:
+                regressors = regressors[:, None]
+            if regressors.ndim != 2 or len(regressors) != n_obs:
+                raise ValueError(
+                    f"Los regresores deben tener {n_obs} filas alineadas con el panel "
+                    f"(forma recibida {regressors.shape})"
+                )
+        
+        # Descartar las fechas con algún precio o volumen no positivo (p. ej. volumen 0)
+        # o con regresores no finitos
+        valid = np.all((self.panel_prices > 0) & (self.panel_quantities > 0), axis=1)
+        if regressors is not None:
+            valid &= np.all(np.isfinite(regressors), axis=1)
+        self.multi_dropped_rows = int(n_obs - np.count_nonzero(valid))
+        prices = self.panel_prices[valid]
+        quantities = self.panel_quantities[valid]
+        
+        columns = [np.ones((len(prices), 1)), np.log(prices)]
+        if regressors is not None:
+            columns.append(regressors[valid])
+        design = np.hstack(columns)
+        
+        n_obs = len(design)
+        if n_obs <= design.shape[1]:
+            raise ValueError(
+                f"Se necesitan más de {design.shape[1]} observaciones comunes "
+                f"con valores positivos (hay {n_obs}, "
+                f"{self.multi_dropped_rows} descartadas)"
+            )
+        
+        log_quantities = np.log(quantities)
+        coefficients, _, rank, _ = np.linalg.lstsq(design, log_quantities, rcond=None)
+        if rank < design.shape[1]:
+            # Con columnas colineales las elasticidades no están identificadas
+            raise ValueError(
+                f"Precios o regresores colineales: rango {rank} de {design.shape[1]} "
+                f"columnas; las elasticidades no se pueden separar"
+            )
+        
+        residuals = log_quantities - design @ coefficients
+        ss_res = np.sum(residuals ** 2, axis=0)
+        ss_tot = np.sum((log_quantities - log_quantities.mean(axis=0)) ** 2, axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r_squared = np.where(ss_tot > 0, 1 - ss_res / ss_tot, np.nan)
+        
+        self.multi_intercepts = coefficients[0]
+        self.cross_elasticity = coefficients[1:n_symbols + 1].T
+        self.multi_coefficients = coefficients[n_symbols + 1:].T
+        self.multi_r_squared = r_squared
+        
+        return self.cross_elasticity, self.multi_r_squared
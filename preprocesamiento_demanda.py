@@ -0,0 +1,295 @@
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# Factor de consistencia de la MAD con el desvío estándar bajo normalidad
+MAD_SCALE = 1.4826
+
+
+class _WaveletMatrix:
+    """
+    Wavelet matrix sobre los rangos de los valores. Se construye una vez en
+    O(n log n) y responde consultas de k-ésimo menor en cualquier rango
+    values[left:right] en O(log n); cada nivel resuelve todas las consultas
+    a la vez, sin ordenar cada ventana por separado
+    """
+
+    def __init__(self, values: np.ndarray):
+        n = len(values)
+        order = np.argsort(values, kind='stable')
+        self.sorted_values = values[order]
+
+        # Índices en int32: la mitad de memoria y de tráfico al indexar por nivel
+        current = np.empty(n, dtype=np.int32)
+        current[order] = np.arange(n, dtype=np.int32)
+
+        # Por nivel (del bit más alto al más bajo): ceros acumulados y total de ceros
+        self.levels = []
+        for bit in range(max(1, (n - 1).bit_length()) - 1, -1, -1):
+            is_zero = ((current >> bit) & 1) == 0
+            zeros_before = np.zeros(n + 1, dtype=np.int32)
+            np.cumsum(is_zero, out=zeros_before[1:])
+            self.levels.append((bit, zeros_before, zeros_before[-1]))
+            # Partición estable: ceros primero, unos después
+            current = np.concatenate((current[is_zero], current[~is_zero]))
+
+    def kth(self, left: np.ndarray, right: np.ndarray, k: np.ndarray) -> np.ndarray:
+        """Retorna el k-ésimo menor (base 0) de values[left:right] para cada consulta"""
+        shape = np.broadcast(left, right, k).shape
+        left = np.broadcast_to(left, shape).astype(np.int32)
+        right = np.broadcast_to(right, shape).astype(np.int32)
+        k = np.broadcast_to(k, shape).astype(np.int32)
+        result = np.zeros(shape, dtype=np.int32)
+
+        # Aritmética entera en lugar de np.where: evita temporales por nivel
+        for bit, zeros_before, n_zeros in self.levels:
+            zeros_left = zeros_before.take(left)
+            zeros_right = zeros_before.take(right)
+            count = zeros_right - zeros_left
+
+            # Si el k-ésimo no está entre los ceros, bajar por la rama de los unos:
+            # rama cero -> zeros_left, rama uno -> n_zeros + left - zeros_left
+            go_one = (k >= count).astype(np.int32)
+            k -= go_one * count
+            left = zeros_left + go_one * (n_zeros + left - 2 * zeros_left)
+            right = zeros_right + go_one * (n_zeros + right - 2 * zeros_right)
+            result |= go_one << bit
+
+        return self.sorted_values[result]
+
+
+def _windows(n: int, window: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Límites [left, right) y tamaño de la ventana centrada de cada punto"""
+    # En los extremos la ventana se desplaza hacia adentro en vez de achicarse
+    left = np.clip(np.arange(n) - window // 2, 0, max(n - window, 0))
+    right = np.minimum(n, left + window)
+    return left, right, right - left
+
+
+def rolling_quantiles(values: np.ndarray, window: int,
+                      quantiles: Sequence[float]) -> np.ndarray:
+    """
+    Calcula cuantiles móviles en ventanas centradas de tamaño `window`,
+    con interpolación lineal como np.quantile
+    Returns: Arreglo de forma (len(quantiles), len(values))
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n == 0:
+        return np.empty((len(quantiles), 0))
+
+    left, right, size = _windows(n, window)
+    matrix = _WaveletMatrix(values)
+
+    positions = np.asarray(quantiles, dtype=float)[:, None] * (size - 1)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.ceil(positions).astype(np.int64)
+
+    low_values = matrix.kth(left, right, lower)
+    high_values = matrix.kth(left, right, upper)
+    return low_values + (positions - lower) * (high_values - low_values)
+
+
+def rolling_median(values: np.ndarray, window: int) -> np.ndarray:
+    """Mediana móvil centrada en ventanas de tamaño `window`"""
+    return rolling_quantiles(values, window, (0.5,))[0]
+
+
+def rolling_median_mad(values: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mediana y MAD móviles exactas: para cada ventana W, median(|x_i - m_W|)
+    con i en W y m_W la mediana de esa misma ventana.
+    Los desvíos de una ventana ordenada forman dos listas crecientes (los
+    valores por debajo y por encima de m_W), así que su k-ésimo menor se
+    obtiene con una búsqueda binaria sobre ambas listas, vectorizada para
+    todas las ventanas: O(n log n) de construcción y O(n log w log n) de consultas
+    Returns: (median, mad) sin escalar
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n == 0:
+        return np.empty(0), np.empty(0)
+
+    left, right, size = _windows(n, window)
+    matrix = _WaveletMatrix(values)
+
+    def sorted_at(j):
+        return matrix.kth(left, right, np.clip(j, 0, size - 1))
+
+    # Con tamaño impar ambos centros coinciden y alcanza una sola consulta
+    k_low, k_high = (size - 1) // 2, size // 2
+    below = sorted_at(k_low)
+    above = below if np.array_equal(k_low, k_high) else sorted_at(k_high)
+    median = (below + above) / 2
+
+    # Ventana ordenada s_0..s_{size-1} partida en h = size // 2:
+    # lower_a = m - s_{h-1-a} (a < h) y upper_b = s_{h+b} - m (b < size - h)
+    half = size // 2
+    n_upper = size - half
+
+    def lower(a):
+        return median - sorted_at(half - 1 - a)
+
+    def upper(b):
+        return sorted_at(half + b) - median
+
+    def kth_deviation(k):
+        # Menor cantidad `a` tomada de lower entre los k + 1 desvíos más chicos.
+        # El resultado es max(lower_{a-1}, upper_{k-a}): se guarda el último
+        # valor consultado de cada lista en vez de repetir esas consultas al final
+        lo = np.maximum(0, k + 1 - n_upper)
+        hi = np.minimum(k + 1, half)
+        # Para k en el centro de la ventana los extremos iniciales son a lo
+        # sumo lower_0 = m - s_{h-1} y upper_0 = s_h - m, ya consultados
+        best_lower = np.where(lo > 0, median - below, -np.inf)
+        best_upper = np.where(k + 1 - hi > 0, above - median, -np.inf)
+        for _ in range(int((hi - lo).max()).bit_length()):
+            active = lo < hi
+            mid = (lo + hi) // 2
+            from_lower = lower(mid)
+            from_upper = upper(k - mid)
+            need_more = active & (from_lower < from_upper)
+            shrink = active & ~need_more
+            best_lower = np.where(need_more, from_lower, best_lower)
+            best_upper = np.where(shrink, from_upper, best_upper)
+            lo = np.where(need_more, mid + 1, lo)
+            hi = np.where(shrink, mid, hi)
+        return np.maximum(best_lower, best_upper)
+
+    mad = kth_deviation(k_low)
+    if not np.array_equal(k_low, k_high):
+        mad = (mad + kth_deviation(k_high)) / 2
+    return median, mad
+
+
+def _noise_scale(values: np.ndarray) -> float:
+    """Desvío robusto del ruido estimado a partir de las diferencias sucesivas"""
+    if len(values) < 2:
+        return 0.0
+    return MAD_SCALE * float(np.median(np.abs(np.diff(values)))) / np.sqrt(2)
+
+
+def _outlier_bounds(values: np.ndarray, method: str, window: int,
+                    threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Límites inferior y superior por punto según MAD o IQR móviles"""
+    # Piso para la escala local: en tramos con tendencia casi lineal la MAD
+    # local tiende a 0 y marcaría como outlier cualquier desvío
+    noise = _noise_scale(values)
+    if method == 'mad':
+        median, mad = rolling_median_mad(values, window)
+        scale = MAD_SCALE * mad
+        scale = np.maximum(scale, noise)
+        return median - threshold * scale, median + threshold * scale
+    if method == 'iqr':
+        q1, q3 = rolling_quantiles(values, window, (0.25, 0.75))
+        # 1.349 * sigma es el IQR de una normal
+        iqr = np.maximum(q3 - q1, 1.349 * noise)
+        return q1 - threshold * iqr, q3 + threshold * iqr
+    raise ValueError(f"Método de outliers '{method}' no soportado")
+
+
+class Preprocessor:
+    """
+    Etapa de preprocesamiento previa a las regresiones.
+    Detecta outliers con MAD o IQR móviles (en orden temporal), los descarta
+    o los winsoriza, y calcula pesos para mínimos cuadrados ponderados.
+    Por defecto solo se revisa la cantidad: un salto de precio es justamente
+    la variación que identifica la curva de demanda.
+    """
+
+    DEFAULT_THRESHOLDS = {'mad': 3.0, 'iqr': 1.5}
+    COLUMNS = ('prices', 'quantities')
+
+    def __init__(self, outlier_method: Optional[str] = 'mad', action: str = 'reject',
+                 window: int = 7, threshold: Optional[float] = None,
+                 volume_weights: bool = False, recency_half_life: Optional[float] = None,
+                 columns: Sequence[str] = ('quantities',)):
+        """
+        Args:
+            outlier_method: 'mad', 'iqr' o None para no filtrar
+            action: 'reject' (peso 0) o 'winsorize' (recorta a los límites)
+            window: Tamaño de la ventana móvil en observaciones
+            threshold: Múltiplo de MAD/IQR (3.0 para MAD y 1.5 para IQR por defecto)
+            volume_weights: Reducir el peso de volúmenes por encima de su mediana móvil
+            recency_half_life: Vida media, en observaciones, del peso por recencia
+            columns: Series en las que se buscan outliers ('prices' y/o 'quantities')
+        """
+        if outlier_method not in (None, 'mad', 'iqr'):
+            raise ValueError(f"Método de outliers '{outlier_method}' no soportado")
+        if action not in ('reject', 'winsorize'):
+            raise ValueError(f"Acción '{action}' no soportada")
+        if window < 3:
+            raise ValueError("La ventana debe tener al menos 3 observaciones")
+        unknown = set(columns) - set(self.COLUMNS)
+        if unknown:
+            raise ValueError(f"Columnas no soportadas: {', '.join(sorted(unknown))}")
+
+        self.outlier_method = outlier_method
+        self.action = action
+        self.window = window
+        self.threshold = threshold
+        self.volume_weights = volume_weights
+        self.recency_half_life = recency_half_life
+        self.columns = tuple(columns)
+
+    def to_dict(self) -> dict:
+        """Configuración serializable (para guardar en la sesión)"""
+        return {
+            'outlier_method': self.outlier_method,
+            'action': self.action,
+            'window': self.window,
+            'threshold': self.threshold,
+            'volume_weights': self.volume_weights,
+            'recency_half_life': self.recency_half_life,
+            'columns': list(self.columns)
+        }
+
+    @classmethod
+    def from_dict(cls, config: dict) -> 'Preprocessor':
+        return cls(**config)
+
+    def apply(self, prices: np.ndarray,
+              quantities: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Aplica el preprocesamiento a series ordenadas en el tiempo
+        Returns: (prices, quantities, weights, outliers) con pesos en [0, 1]
+                 y outliers como máscara de puntos descartados o winsorizados
+        """
+        prices = np.asarray(prices, dtype=float).copy()
+        quantities = np.asarray(quantities, dtype=float).copy()
+        n = len(prices)
+        weights = np.ones(n)
+        outliers = np.zeros(n, dtype=bool)
+
+        if self.outlier_method is not None and n >= 3:
+            threshold = self.threshold
+            if threshold is None:
+                threshold = self.DEFAULT_THRESHOLDS[self.outlier_method]
+            window = min(self.window, n)
+
+            checked = {'prices': prices, 'quantities': quantities}
+            for column in self.columns:
+                series = checked[column]
+                low, high = _outlier_bounds(series, self.outlier_method, window, threshold)
+                outliers |= (series < low) | (series > high)
+                if self.action == 'winsorize':
+                    np.clip(series, low, high, out=series)
+
+            if self.action == 'reject':
+                weights[outliers] = 0.0
+
+        if self.volume_weights and n >= 3:
+            typical = rolling_median(quantities, min(self.window, n))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                relative = np.where(quantities > 0, typical / quantities, 1.0)
+            weights *= np.clip(relative, 0.0, 1.0)
+
+        if self.recency_half_life:
+            age = np.arange(n - 1, -1, -1)
+            weights *= 0.5 ** (age / self.recency_half_life)
+
+        if weights.max(initial=0.0) > 0:
+            weights /= weights.max()
+
+        return prices, quantities, weights, outliers
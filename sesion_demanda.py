@@ -0,0 +1,167 @@
+import json
+import os
+import struct
+import zipfile
+from typing import Optional
+
+import numpy as np
+
+from model_demanda import DemandModel
+from preprocesamiento_demanda import Preprocessor
+
+
+SESSION_FORMAT = 'graficanda-session'
+SESSION_VERSION = 1
+META_NAME = 'meta.json'
+
+# Atributos de DemandModel que se guardan como arreglos (.npy dentro del zip)
+ARRAY_FIELDS = (
+    'prices', 'quantities', 'weights', 'outliers',
+    'panel_timestamps', 'panel_prices', 'panel_quantities',
+    'cross_elasticity', 'multi_intercepts', 'multi_coefficients', 'multi_r_squared',
+)
+
+# Resultados escalares que se guardan en el encabezado JSON
+SCALAR_FIELDS = (
+    'linear_slope', 'linear_intercept', 'linear_r_squared', 'linear_p_value',
+    'log_a', 'log_b', 'log_r_squared', 'log_elasticity',
+)
+
+SERIES_PARTS = ('timestamps', 'prices', 'volumes')
+
+
+def default_session_path() -> str:
+    """Ruta por defecto de la sesión del usuario"""
+    return os.path.join(os.path.expanduser('~'), '.graficanda', 'sesion.npz')
+
+
+def _to_scalar(value):
+    return None if value is None else float(value)
+
+
+def _detach_arrays(model: DemandModel):
+    """
+    Copia a memoria todos los arreglos del modelo. Tras un load_session con
+    mmap pueden seguir apuntando al archivo de sesión, y en Windows no se
+    puede reemplazar un archivo que sigue mapeado
+    """
+    for name, value in list(vars(model).items()):
+        if isinstance(value, np.ndarray):
+            setattr(model, name, np.array(value))
+    model.series_cache = {
+        symbol: tuple(np.array(part) for part in series)
+        for symbol, series in model.series_cache.items()
+    }
+
+
+def save_session(path: str, model: DemandModel, view_state: Optional[dict] = None,
+                 compress: bool = False):
+    """
+    Guarda el estado del modelo y de la vista en un archivo .npz versionado.
+    El primer miembro es un encabezado JSON (meta.json) y el resto son .npy.
+    Sin compresión los arreglos pueden luego mapearse en memoria al cargar.
+    Antes de escribir se copian a memoria los arreglos mapeados del modelo.
+    """
+    _detach_arrays(model)
+
+    arrays = {name: getattr(model, name) for name in ARRAY_FIELDS
+              if getattr(model, name) is not None}
+    for symbol, series in model.series_cache.items():
+        for part, value in zip(SERIES_PARTS, series):
+            arrays[f"cache/{symbol}/{part}"] = value
+
+    meta = {
+        'format': SESSION_FORMAT,
+        'version': SESSION_VERSION,
+        'scalars': {name: _to_scalar(getattr(model, name)) for name in SCALAR_FIELDS},
+        'preprocessing': model.preprocessor.to_dict() if model.preprocessor else None,
+        'panel_symbols': list(model.panel_symbols),
+        'cache_symbols': list(model.series_cache),
+        'arrays': list(arrays),
+        'view': view_state or {},
+    }
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+
+    compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    with zipfile.ZipFile(tmp_path, 'w', compression=compression) as zf:
+        zf.writestr(META_NAME, json.dumps(meta))
+        for name, value in arrays.items():
+            with zf.open(name + '.npy', 'w', force_zip64=True) as f:
+                np.lib.format.write_array(f, value, allow_pickle=False)
+
+    # Reemplazo atómico para no dejar una sesión corrupta si se interrumpe
+    os.replace(tmp_path, path)
+
+
+def _memmap_member(path: str, info: zipfile.ZipInfo) -> Optional[np.ndarray]:
+    """Mapea en memoria un .npy guardado sin compresión dentro del zip"""
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+
+    with open(path, 'rb') as f:
+        # Encabezado local del zip: 30 bytes fijos + nombre + campo extra
+        f.seek(info.header_offset)
+        local_header = f.read(30)
+        name_len, extra_len = struct.unpack('<HH', local_header[26:30])
+        f.seek(info.header_offset + 30 + name_len + extra_len)
+
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+
+    if dtype.hasobject or int(np.prod(shape)) == 0:
+        return None
+
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape,
+                     order='F' if fortran_order else 'C')
+
+
+def load_session(path: str, model: DemandModel, mmap: bool = True) -> dict:
+    """
+    Restaura en el modelo una sesión guardada con save_session
+    Args:
+        mmap: Mapear los arreglos en memoria (solo lectura) en vez de copiarlos
+    Returns: Estado de la vista guardado en la sesión
+    """
+    with zipfile.ZipFile(path) as zf:
+        meta = json.loads(zf.read(META_NAME))
+        if meta.get('format') != SESSION_FORMAT:
+            raise ValueError(f"{path} no es un archivo de sesión válido")
+        if meta.get('version', 0) > SESSION_VERSION:
+            raise ValueError(
+                f"La sesión usa la versión {meta['version']} del formato "
+                f"(soportada hasta {SESSION_VERSION})"
+            )
+
+        arrays = {}
+        for name in meta['arrays']:
+            info = zf.getinfo(name + '.npy')
+            value = _memmap_member(path, info) if mmap else None
+            if value is None:
+                with zf.open(info) as f:
+                    value = np.lib.format.read_array(f, allow_pickle=False)
+            arrays[name] = value
+
+    # Los resultados no calculados (pesos, multivariados) se guardan como ausentes
+    for name in ARRAY_FIELDS:
+        setattr(model, name, arrays.get(name))
+
+    for name in SCALAR_FIELDS:
+        setattr(model, name, meta['scalars'].get(name))
+
+    preprocessing = meta.get('preprocessing')
+    model.preprocessor = Preprocessor.from_dict(preprocessing) if preprocessing else None
+
+    model.panel_symbols = list(meta.get('panel_symbols', []))
+    model.series_cache = {
+        symbol: tuple(arrays[f"cache/{symbol}/{part}"] for part in SERIES_PARTS)
+        for symbol in meta.get('cache_symbols', [])
+    }
+
+    return meta.get('view', {})
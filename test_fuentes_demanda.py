@@ -0,0 +1,218 @@
+import os
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import numpy as np
+import pytest
+import requests
+
+from fuentes_demanda import (
+    CircuitBreaker, CSVDirectorySource, FixtureSource, TokenBucket, YahooFinanceSource
+)
+
+
+class FakeClock:
+    """Reloj simulado: sleep avanza el tiempo sin esperar"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeResponse:
+    def __init__(self, status_code: int = 200, data: dict = None, headers: dict = None):
+        self.status_code = status_code
+        self._data = data
+        self.headers = headers or {}
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}", response=self)
+
+
+class FakeSession:
+    """Sesión HTTP que devuelve respuestas predefinidas en orden"""
+
+    def __init__(self, responses):
+        self.headers = {}
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def chart(closes, volumes, timestamps=None) -> dict:
+    if timestamps is None:
+        timestamps = [1_700_000_000 + 86400 * i for i in range(len(closes))]
+    return {'chart': {'result': [{
+        'timestamp': timestamps,
+        'indicators': {'quote': [{'close': closes, 'volume': volumes}]}
+    }]}}
+
+
+def make_source(responses, clock=None, **kwargs) -> YahooFinanceSource:
+    clock = clock or FakeClock()
+    return YahooFinanceSource(session=FakeSession(responses), clock=clock,
+                              sleep=clock.sleep, **kwargs)
+
+
+def test_retry_then_success():
+    source = make_source([
+        requests.ConnectionError("caída"),
+        FakeResponse(503),
+        FakeResponse(200, chart([10.0, None, 12.0], [100, 200, 300])),
+    ])
+
+    timestamps, prices, volumes = source.fetch_series('AAPL')
+
+    assert source.session.calls == 3
+    np.testing.assert_array_equal(prices, [10.0, 12.0])
+    np.testing.assert_array_equal(volumes, [100.0, 300.0])
+    assert source.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_client_error_is_not_retried():
+    source = make_source([FakeResponse(404), FakeResponse(200, chart([1.0], [1]))])
+
+    with pytest.raises(requests.HTTPError):
+        source.fetch_series('XXXX')
+    assert source.session.calls == 1
+
+
+def test_throttling_waits_full_retry_after_and_spares_breaker():
+    clock = FakeClock()
+    source = make_source([
+        FakeResponse(429, headers={'Retry-After': '30'}),
+        FakeResponse(429, headers={'Retry-After': '30'}),
+        FakeResponse(200, chart([10.0], [100])),
+    ], clock=clock, circuit_breaker=CircuitBreaker(failure_threshold=1, clock=clock))
+
+    source.fetch_series('AAPL')
+
+    assert clock.now >= 60
+    assert source.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_retry_after_http_date_and_limit():
+    source = make_source([], max_retry_after=10)
+    future = datetime.now(timezone.utc) + timedelta(seconds=90)
+    assert 80 < source._retry_after(format_datetime(future, usegmt=True)) <= 90
+    assert source._retry_after('garbage') is None
+
+    source.session.responses = [FakeResponse(429, headers={'Retry-After': '600'})]
+    with pytest.raises(ValueError, match="esperar"):
+        source.fetch_series('AAPL')
+    assert source.session.calls == 1
+
+
+def test_breaker_opens_then_allows_single_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    clock.now = 11
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+
+def test_breaker_resets_on_success():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, clock=clock)
+    breaker.record_failure()
+
+    clock.now = 6
+    assert breaker.allow_request()
+    breaker.record_success()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request() and breaker.allow_request()
+
+
+def test_token_bucket_pause_delays_next_token():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, capacity=2, clock=clock, sleep=clock.sleep)
+    bucket.acquire()
+    bucket.pause(30)
+    bucket.acquire()
+    assert clock.now >= 30
+
+
+def test_recorded_response_replays_through_fixture_source(tmp_path):
+    data = chart([10.0, 11.0, None, 13.0], [100, 110, 120, 130])
+    source = make_source([FakeResponse(200, data)], record_dir=str(tmp_path))
+    recorded = source.fetch_series('MSFT')
+
+    assert os.path.exists(tmp_path / 'MSFT.json')
+    replayed = FixtureSource(str(tmp_path)).fetch_series('MSFT')
+    for a, b in zip(recorded, replayed):
+        np.testing.assert_array_equal(a, b)
+
+    with pytest.raises(ValueError):
+        FixtureSource(str(tmp_path)).fetch_series('AAPL')
+
+
+def test_csv_column_detection_and_date_filter(tmp_path):
+    (tmp_path / 'AAPL.csv').write_text(
+        "Fecha,Open,Adj Close,Volumen\n"
+        "2024-01-10,1,12.0,300\n"
+        "2023-12-01,1,9.0,100\n"
+        "2024-01-05,1,11.0,\n"
+        "2024-01-08,1,10.5,250\n"
+    )
+
+    timestamps, prices, volumes = CSVDirectorySource(str(tmp_path)).fetch_series('AAPL', days=30)
+
+    # Ordenado por fecha, sin la fila sin volumen ni la de más de 30 días atrás
+    assert np.all(np.diff(timestamps) > 0)
+    np.testing.assert_array_equal(prices, [10.5, 12.0])
+    np.testing.assert_array_equal(volumes, [250.0, 300.0])
+
+
+def test_csv_without_price_column_is_rejected(tmp_path):
+    (tmp_path / 'AAPL.csv').write_text("date,open,volume\n2024-01-10,1,300\n")
+    with pytest.raises(ValueError):
+        CSVDirectorySource(str(tmp_path)).fetch_series('AAPL')
+
+
+def test_throughput_is_stable_under_simulated_throttling():
+    # Cada 10 pedidos el servicio responde 429 con Retry-After de 2 s
+    clock = FakeClock()
+    responses = []
+    for i in range(200):
+        if i % 10 == 9:
+            responses.append(FakeResponse(429, headers={'Retry-After': '2'}))
+        responses.append(FakeResponse(200, chart([10.0], [100])))
+    source = make_source(responses, clock=clock)
+
+    for _ in range(200):
+        source.fetch_series('AAPL')
+
+    assert source.circuit_breaker.state == CircuitBreaker.CLOSED
+    # 2 pedidos/s de tasa sostenida más 20 pausas de 2 s: ~1.4 pedidos/s simulados
+    throughput = 200 / clock.now
+    assert 1.2 < throughput < 2.0
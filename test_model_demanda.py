@@ -0,0 +1,142 @@
+import time
+
+import numpy as np
+import pytest
+from scipy import stats
+
+from model_demanda import DemandModel
+
+DAY = 86400
+START = 1_700_000_000 - 1_700_000_000 % DAY
+
+
+def _known_panel(n_obs: int = 400, seed: int = 0):
+    """Panel sintético con matriz de elasticidades conocida y sin ruido"""
+    rng = np.random.default_rng(seed)
+    elasticity = np.array([[-1.2, 0.3, 0.1],
+                           [0.4, -0.8, -0.2],
+                           [0.0, 0.5, -1.5]])
+    intercepts = np.array([5.0, 4.0, 6.0])
+    log_prices = rng.normal(4.0, 0.3, (n_obs, 3))
+    log_quantities = intercepts + log_prices @ elasticity.T
+    return elasticity, np.exp(log_prices), np.exp(log_quantities)
+
+
+def test_weighted_fit_with_unit_weights_matches_linregress():
+    rng = np.random.default_rng(2)
+    x = rng.uniform(10, 20, 50)
+    y = 100 - 3 * x + rng.normal(0, 2, 50)
+
+    result = DemandModel._weighted_linregress(x, y, np.ones(50))
+
+    expected = stats.linregress(x, y)
+    np.testing.assert_allclose(result, (expected.slope, expected.intercept,
+                                        expected.rvalue, expected.pvalue))
+
+
+def test_weighted_fit_drops_zero_weight_points():
+    rng = np.random.default_rng(3)
+    x = rng.uniform(10, 20, 50)
+    y = 100 - 3 * x + rng.normal(0, 2, 50)
+    weights = np.ones(50)
+    weights[::7] = 0.0
+    # Valores extremos en los puntos descartados no deben afectar el ajuste
+    y[::7] = 1e6
+
+    result = DemandModel._weighted_linregress(x, y, weights)
+
+    kept = weights > 0
+    expected = stats.linregress(x[kept], y[kept])
+    np.testing.assert_allclose(result, (expected.slope, expected.intercept,
+                                        expected.rvalue, expected.pvalue))
+
+
+def test_align_series_unsorted_input_and_duplicate_days():
+    a = (np.array([START + 2 * DAY, START, START + DAY, START + DAY + 3600]),
+         np.array([3.0, 1.0, 2.0, 2.5]),
+         np.array([30.0, 10.0, 20.0, 25.0]))
+    b = (np.array([START + DAY, START + 3 * DAY, START + 2 * DAY]),
+         np.array([20.0, 40.0, 30.0]),
+         np.array([200.0, 400.0, 300.0]))
+
+    timestamps, prices, volumes = DemandModel.align_series([a, b])
+
+    np.testing.assert_array_equal(timestamps, [START + DAY, START + 2 * DAY])
+    # Del día repetido se conserva la última observación
+    np.testing.assert_array_equal(prices, [[2.5, 20.0], [3.0, 30.0]])
+    np.testing.assert_array_equal(volumes, [[25.0, 200.0], [30.0, 300.0]])
+
+
+def test_align_series_rejects_positional_timestamps():
+    positional = (np.arange(5), np.ones(5), np.ones(5))
+    dated = (START + DAY * np.arange(5), np.ones(5), np.ones(5))
+    with pytest.raises(ValueError, match="fechas reales"):
+        DemandModel.align_series([dated, positional])
+
+
+def test_multivariate_regression_recovers_known_elasticities():
+    elasticity, prices, quantities = _known_panel()
+    model = DemandModel()
+    model.update_panel_data(['A', 'B', 'C'], START + DAY * np.arange(len(prices)),
+                            prices, quantities)
+
+    cross, r_squared = model.calculate_multivariate_regression()
+
+    np.testing.assert_allclose(cross, elasticity, atol=1e-8)
+    np.testing.assert_allclose(r_squared, 1.0)
+    assert model.multi_dropped_rows == 0
+
+
+def test_multivariate_regression_drops_invalid_rows():
+    elasticity, prices, quantities = _known_panel()
+    quantities[5, 1] = 0.0
+    prices[9, 2] = -1.0
+    regressors = np.sin(np.arange(len(prices)))
+    regressors[12] = np.nan
+    regressors[20] = np.inf
+    model = DemandModel()
+    model.update_panel_data(['A', 'B', 'C'], START + DAY * np.arange(len(prices)),
+                            prices, quantities)
+
+    cross, _ = model.calculate_multivariate_regression(regressors)
+
+    assert model.multi_dropped_rows == 4
+    np.testing.assert_allclose(cross, elasticity, atol=1e-8)
+
+
+def test_multivariate_regression_validates_regressors_and_rank():
+    _, prices, quantities = _known_panel()
+    model = DemandModel()
+    model.update_panel_data(['A', 'B', 'C'], START + DAY * np.arange(len(prices)),
+                            prices, quantities)
+
+    with pytest.raises(ValueError, match="filas"):
+        model.calculate_multivariate_regression(np.ones((len(prices) // 2, 2)))
+
+    prices[:, 2] = prices[:, 1]
+    model.update_panel_data(['A', 'B', 'C'], START + DAY * np.arange(len(prices)),
+                            prices, quantities)
+    with pytest.raises(ValueError, match="colineales"):
+        model.calculate_multivariate_regression()
+
+
+def test_panel_of_50_tickers_aligns_and_fits_quickly():
+    rng = np.random.default_rng(1)
+    n_days = 2500
+    series = []
+    for _ in range(50):
+        keep = rng.random(n_days) > 0.002
+        order = rng.permutation(np.count_nonzero(keep))
+        timestamps = (START + DAY * np.arange(n_days))[keep][order]
+        series.append((timestamps, rng.uniform(50, 150, len(order)),
+                       rng.uniform(1e6, 2e6, len(order))))
+
+    started = time.perf_counter()
+    timestamps, prices, volumes = DemandModel.align_series(series)
+    model = DemandModel()
+    model.update_panel_data([f"T{i}" for i in range(50)], timestamps, prices, volumes)
+    model.calculate_multivariate_regression()
+    elapsed = time.perf_counter() - started
+
+    assert model.cross_elasticity.shape == (50, 50)
+    assert elapsed < 2.0
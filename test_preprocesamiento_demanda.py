@@ -0,0 +1,130 @@
+import time
+
+import numpy as np
+import pytest
+
+from preprocesamiento_demanda import (
+    Preprocessor, _WaveletMatrix, _windows, rolling_median_mad, rolling_quantiles
+)
+
+# Un año de velas de 1 minuto en horario de mercado (390 por día)
+INTRADAY_POINTS = 252 * 390
+
+
+def _brute_windows(values: np.ndarray, window: int):
+    """Ventanas centradas calculadas a mano, desplazadas hacia adentro en los extremos"""
+    n = len(values)
+    size = min(window, n)
+    for i in range(n):
+        left = min(max(i - window // 2, 0), n - size)
+        yield values[left:left + size]
+
+
+# Con empates (valores enteros chicos), ventanas pares e impares y ventanas
+# más grandes que la serie
+CASES = [
+    (values, window)
+    for values in (np.random.default_rng(0).normal(size=40),
+                   np.random.default_rng(1).integers(0, 3, 40).astype(float),
+                   np.array([5.0, 5.0, 5.0, 1.0, 5.0]),
+                   np.array([2.0, 1.0]),
+                   np.array([7.0]))
+    for window in (3, 4, 7, 10, 50)
+]
+
+
+def test_windows_shift_inward_at_the_edges():
+    left, right, size = _windows(10, 4)
+    np.testing.assert_array_equal(left, [0, 0, 0, 1, 2, 3, 4, 5, 6, 6])
+    np.testing.assert_array_equal(right - left, 4)
+    np.testing.assert_array_equal(size, 4)
+
+    # Ventana más grande que la serie: una sola ventana con toda la serie
+    left, right, size = _windows(3, 7)
+    np.testing.assert_array_equal(left, 0)
+    np.testing.assert_array_equal(right, 3)
+
+
+def test_wavelet_matrix_kth_matches_sorted_ranges():
+    values = np.random.default_rng(2).integers(0, 5, 30).astype(float)
+    matrix = _WaveletMatrix(values)
+    left, right = np.triu_indices(len(values) + 1, k=1)
+    for k in range(len(values)):
+        valid = right - left > k
+        expected = [np.sort(values[a:b])[k] for a, b in zip(left[valid], right[valid])]
+        np.testing.assert_array_equal(matrix.kth(left[valid], right[valid], k), expected)
+
+
+@pytest.mark.parametrize("values, window", CASES)
+def test_rolling_quantiles_match_numpy(values, window):
+    quantiles = (0.1, 0.25, 0.5, 0.75)
+    expected = np.array([np.quantile(w, quantiles) for w in _brute_windows(values, window)]).T
+    np.testing.assert_allclose(rolling_quantiles(values, window, quantiles), expected)
+
+
+@pytest.mark.parametrize("values, window", CASES)
+def test_rolling_median_mad_matches_brute_force(values, window):
+    windows = list(_brute_windows(values, window))
+    expected_median = np.array([np.median(w) for w in windows])
+    expected_mad = np.array([np.median(np.abs(w - np.median(w))) for w in windows])
+
+    median, mad = rolling_median_mad(values, window)
+
+    np.testing.assert_allclose(median, expected_median)
+    np.testing.assert_allclose(mad, expected_mad)
+
+
+def test_rolling_statistics_of_empty_series():
+    assert rolling_quantiles(np.empty(0), 5, (0.5,)).shape == (1, 0)
+    median, mad = rolling_median_mad(np.empty(0), 5)
+    assert median.size == mad.size == 0
+
+
+def test_outliers_are_checked_on_quantities_by_default():
+    rng = np.random.default_rng(4)
+    prices = 100 + rng.normal(0, 0.5, 60)
+    quantities = 1000 + rng.normal(0, 5, 60)
+    prices[20] = 130.0
+    quantities[40] = 5000.0
+
+    _, _, weights, outliers = Preprocessor('mad').apply(prices, quantities)
+    np.testing.assert_array_equal(np.flatnonzero(outliers), [40])
+    assert weights[40] == 0.0
+
+    both = Preprocessor('mad', columns=('prices', 'quantities'))
+    _, _, _, outliers = both.apply(prices, quantities)
+    np.testing.assert_array_equal(np.flatnonzero(outliers), [20, 40])
+
+
+def test_preprocessor_config_round_trip():
+    preprocessor = Preprocessor('iqr', action='winsorize', columns=('prices',))
+    restored = Preprocessor.from_dict(preprocessor.to_dict())
+    assert restored.to_dict() == preprocessor.to_dict()
+    assert restored.columns == ('prices',)
+
+    with pytest.raises(ValueError, match="Columnas"):
+        Preprocessor(columns=('volumes',))
+
+
+def test_rolling_median_mad_is_fast_at_intraday_size():
+    rng = np.random.default_rng(0)
+    values = 100 + np.cumsum(rng.normal(0, 0.05, 2 * INTRADAY_POINTS))
+
+    started = time.perf_counter()
+    median, mad = rolling_median_mad(values, 21)
+    elapsed = time.perf_counter() - started
+
+    assert median.shape == mad.shape == values.shape
+    assert elapsed < 2.0
+
+
+def test_preprocessor_is_fast_at_intraday_size():
+    rng = np.random.default_rng(1)
+    prices = 100 + np.cumsum(rng.normal(0, 0.05, INTRADAY_POINTS))
+    quantities = rng.lognormal(8, 0.5, INTRADAY_POINTS)
+
+    started = time.perf_counter()
+    Preprocessor(window=21, volume_weights=True).apply(prices, quantities)
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 3.0
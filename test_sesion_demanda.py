@@ -0,0 +1,84 @@
+import numpy as np
+
+from model_demanda import DemandModel
+from preprocesamiento_demanda import Preprocessor
+from sesion_demanda import load_session, save_session
+
+
+def _sample_model() -> DemandModel:
+    model = DemandModel()
+    model.update_data(np.array([100.0, 90.0, 80.0, 70.0]), np.array([10.0, 15.0, 20.0, 30.0]))
+    model.set_preprocessor(Preprocessor('mad', window=3))
+    model.calculate_linear_regression()
+
+    rng = np.random.default_rng(0)
+    model.panel_symbols = ['AAPL', 'MSFT', 'NVDA']
+    model.panel_timestamps = np.arange(6, dtype=np.int64) * 86400
+    # Arreglo 2-D en orden Fortran
+    model.panel_prices = np.asfortranarray(rng.uniform(50, 150, (6, 3)))
+    model.panel_quantities = rng.uniform(1, 2, (6, 3))
+    model.cross_elasticity = rng.normal(size=(3, 3))
+    # Sin regresores adicionales: arreglo vacío
+    model.multi_coefficients = np.empty((3, 0))
+
+    model.series_cache['AAPL'] = (
+        np.array([0, 86400, 172800], dtype=np.int64),
+        np.array([101.0, 102.5, 99.0]),
+        np.array([1.5e6, 2.0e6, 1.8e6]),
+    )
+    return model
+
+
+def _assert_same_state(restored: DemandModel, original: DemandModel):
+    for name in ('prices', 'quantities', 'weights', 'outliers', 'panel_timestamps', 'panel_prices',
+                 'panel_quantities', 'cross_elasticity', 'multi_coefficients'):
+        np.testing.assert_array_equal(getattr(restored, name), getattr(original, name))
+        assert getattr(restored, name).shape == getattr(original, name).shape
+    assert restored.multi_intercepts is None
+    assert restored.outliers.dtype == bool
+    assert restored.preprocessor.to_dict() == original.preprocessor.to_dict()
+    assert restored.linear_slope == original.linear_slope
+    assert restored.panel_symbols == original.panel_symbols
+    for part, expected in zip(restored.series_cache['AAPL'], original.series_cache['AAPL']):
+        np.testing.assert_array_equal(part, expected)
+
+
+def test_session_round_trip_with_mmap(tmp_path):
+    path = str(tmp_path / 'sesion.npz')
+    original = _sample_model()
+    view_state = {'api_source': 'Apple', 'visualization_mode': 'log'}
+
+    save_session(path, original, view_state)
+
+    restored = DemandModel()
+    assert load_session(path, restored) == view_state
+    _assert_same_state(restored, original)
+    assert isinstance(restored.panel_prices, np.memmap)
+    assert restored.panel_prices.flags.f_contiguous
+    assert isinstance(restored.series_cache['AAPL'][1], np.memmap)
+    assert isinstance(restored.weights, np.memmap)
+    # Los arreglos vacíos no se pueden mapear y se leen normalmente
+    assert not isinstance(restored.multi_coefficients, np.memmap)
+
+    # Guardar sobre el mismo archivo mientras el modelo lo tiene mapeado
+    save_session(path, restored, view_state)
+    assert not isinstance(restored.panel_prices, np.memmap)
+
+    reloaded = DemandModel()
+    assert load_session(path, reloaded) == view_state
+    _assert_same_state(reloaded, original)
+
+    # Sin preprocesamiento los pesos quedan ausentes
+    unweighted = _sample_model()
+    unweighted.set_preprocessor(None)
+    unweighted.calculate_linear_regression()
+    save_session(path, unweighted)
+    plain = DemandModel()
+    load_session(path, plain)
+    assert plain.weights is None and plain.outliers is None
+
+    save_session(path, original, view_state)
+    copied = DemandModel()
+    load_session(path, copied, mmap=False)
+    _assert_same_state(copied, original)
+    assert not isinstance(copied.panel_prices, np.memmap)
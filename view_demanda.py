@@ -6,6 +6,7 @@ from PySide6.QtCore import Qt, Signal, QSize
 from PySide6.QtGui import QFont, QIcon, QPixmap, QPainter, QColor
 import numpy as np
 import os
+from typing import Iterable
 
 
 class MainWindow(QMainWindow):
@@ -15,6 +16,7 @@ class MainWindow(QMainWindow):
     apply_manual_data = Signal(str, str)
     calculate_regression = Signal()
     visualization_changed = Signal(str)
+    closing = Signal()
     
     def __init__(self):
         super().__init__()
@@ -98,6 +100,10 @@ class MainWindow(QMainWindow):
         api_row.addWidget(self.load_api_btn)
         
         api_layout.addLayout(api_row)
+        
+        self.cross_elasticity_btn = QPushButton("Elasticidad cruzada (todas)")
+        self.cross_elasticity_btn.setMinimumHeight(36)
+        api_layout.addWidget(self.cross_elasticity_btn)
         layout.addWidget(api_frame)
         
         manual_frame = QFrame()
@@ -157,6 +163,15 @@ class MainWindow(QMainWindow):
         self.viz_button_group.addButton(self.viz_log)
         viz_layout.addWidget(self.viz_log)
         
+        preprocess_label = QLabel("Preprocesamiento:")
+        preprocess_label.setFont(QFont("Arial", 10, QFont.Bold))
+        viz_layout.addWidget(preprocess_label)
+        
+        # Las opciones las carga el controlador (set_preprocessing_options)
+        self.preprocess_combo = QComboBox()
+        self.preprocess_combo.setMinimumHeight(32)
+        viz_layout.addWidget(self.preprocess_combo)
+        
         layout.addWidget(viz_frame)
         
         self.calculate_btn = QPushButton("Calcular Regresión")
@@ -327,3 +342,44 @@ class MainWindow(QMainWindow):
             return "log"
         else:
             return "both"
+    
+    def set_visualization_mode(self, mode: str):
+        """Selecciona el modo de visualización ('linear', 'log' o 'both')"""
+        if mode == "linear":
+            self.viz_linear.setChecked(True)
+        elif mode == "log":
+            self.viz_log.setChecked(True)
+        else:
+            self.viz_both.setChecked(True)
+    
+    def set_preprocessing_options(self, labels: Iterable[str]):
+        """Carga las opciones de preprocesamiento en el selector"""
+        self.preprocess_combo.clear()
+        self.preprocess_combo.addItems(list(labels))
+    
+    def get_session_state(self) -> dict:
+        """Retorna las selecciones de la ventana para guardarlas en la sesión"""
+        return {
+            'api_source': self.api_combo.currentText(),
+            'prices_text': self.prices_input.text(),
+            'quantities_text': self.quantities_input.text(),
+            'visualization_mode': self.get_visualization_mode(),
+            'preprocessing': self.preprocess_combo.currentText()
+        }
+    
+    def restore_session_state(self, state: dict):
+        """Restaura las selecciones de la ventana guardadas en la sesión"""
+        index = self.api_combo.findText(state.get('api_source', ''))
+        if index >= 0:
+            self.api_combo.setCurrentIndex(index)
+        self.prices_input.setText(state.get('prices_text', ''))
+        self.quantities_input.setText(state.get('quantities_text', ''))
+        self.set_visualization_mode(state.get('visualization_mode', 'both'))
+        index = self.preprocess_combo.findText(state.get('preprocessing', ''))
+        if index >= 0:
+            self.preprocess_combo.setCurrentIndex(index)
+    
+    def closeEvent(self, event):
+        """Avisa al controlador antes de cerrar la ventana"""
+        self.closing.emit()
+        super().closeEvent(event)